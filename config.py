@@ -0,0 +1,104 @@
+from dotenv import load_dotenv
+from groq import AsyncGroq
+import os
+
+# Load environment variables
+load_dotenv()
+
+# JWT settings
+SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_HOURS = 24
+
+# bcrypt work factor; every +1 doubles hashing time on register/login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "10"))
+
+# Database
+DATABASE_URL = os.getenv("DATABASE_URL")
+# Per worker, so the server sees workers x DB_POOL_MAX connections
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "5"))
+# psycopg2 closes connections returned while minconn are already idle, so this
+# is how many stay open; it defaults to the full pool size
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", str(DB_POOL_MAX)))
+
+# Extra origins allowed to call the API from the browser; the bundled UI is
+# served by the app itself, so none are needed by default
+FRONTEND_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv("FRONTEND_ORIGIN", "").split(",")
+    if origin.strip()
+]
+
+# Exact-match cache for /repurpose results
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+
+# Semantic cache settings (opt-in, requires pgvector + sentence-transformers)
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "0") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+
+# Longest article (in tokens) accepted by /repurpose
+MAX_ARTICLE_TOKENS = int(os.getenv("MAX_ARTICLE_TOKENS", "32000"))
+
+# Get Groq API key
+api_key = os.getenv("GROQ_API_KEY")
+
+if not api_key:
+    raise ValueError("GROQ_API_KEY not found in .env file")
+
+# Create Groq client
+client = AsyncGroq(api_key=api_key)
+
+
+# ── Platform Prompts ─────────────────────────────────────────
+PLATFORM_PROMPTS = {
+    "twitter": """
+You are a viral Twitter/X content expert.
+Convert the article into a punchy 5-tweet thread.
+- Start with a hook tweet that grabs attention immediately
+- Each tweet must be under 280 characters
+- Label each tweet: Tweet 1:, Tweet 2:, etc.
+- End with a call-to-action tweet
+- Add relevant hashtags
+""",
+    "linkedin": """
+You are a professional LinkedIn content strategist.
+Convert the article into a LinkedIn post.
+- Start with a bold first line that stops the scroll
+- Use short paragraphs (2-3 lines max)
+- Add 3-5 key takeaways using bullet points
+- End with a thought-provoking question
+- Keep it between 150-300 words
+""",
+    "instagram": """
+You are an Instagram caption expert.
+Convert the article into an engaging Instagram caption.
+- Hook in the first line
+- Storytelling style, personal and relatable
+- Add a clear call-to-action at the end
+- Suggest 10 relevant hashtags at the bottom
+- Keep caption under 200 words
+""",
+    "newsletter": """
+You are an email newsletter writer.
+Convert the article into a short newsletter section.
+- Write a catchy subject line first (label it: Subject:)
+- Conversational, friendly tone
+- Summarize the core idea in 3 short paragraphs
+- Add one actionable tip the reader can use today
+- End with a 1-sentence teaser for next week
+""",
+    "medium": """
+You are a Medium blog writer.
+Convert the article into a well-structured Medium post.
+- Write a compelling title (label it: Title:)
+- Start with a strong opening paragraph that draws the reader in
+- Use clear subheadings to break up sections
+- Write in a thoughtful, conversational tone
+- Include real examples or analogies to explain key points
+- End with a powerful conclusion and a question for readers
+- Aim for 400-600 words
+"""
+}
@@ -1,42 +1,150 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, validator
-from dotenv import load_dotenv
 from typing import Literal, Optional
-import os
+import asyncio
+import logging
+import threading
+from collections import deque
 import psycopg2
 import psycopg2.extras
+import psycopg2.extensions
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from groq import Groq
 import bcrypt
 import re
+import string
+import time
+import hashlib
+from cachetools import TTLCache
+import tiktoken
 from jose import jwt, JWTError
-from fastapi.responses import HTMLResponse 
-from fastapi.staticfiles import StaticFiles 
+from fastapi.responses import HTMLResponse, StreamingResponse, ORJSONResponse
+from fastapi.staticfiles import StaticFiles
+from config import (
+    SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_HOURS, BCRYPT_ROUNDS,
+    DB_POOL_MIN, DB_POOL_MAX, DATABASE_URL, FRONTEND_ORIGINS,
+    RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, MAX_ARTICLE_TOKENS,
+    SEMANTIC_CACHE, SEMANTIC_CACHE_THRESHOLD, EMBEDDING_MODEL, EMBEDDING_DIM,
+    PLATFORM_PROMPTS, client,
+)
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 security = HTTPBearer()
-app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# JWT settings
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_HOURS = 24
+#allows frontends on other origins (FRONTEND_ORIGIN) to talk to FastAPI
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=FRONTEND_ORIGINS,
+    allow_methods=["GET", "POST"],
+    allow_headers=["Authorization", "Content-Type"],
+    max_age=86400,
+)
+app.mount("/static", StaticFiles(directory="static"), name="static")
 
 
 # ── Database ──────────────────────────────────────────────────
+POOL = None
+# Bounds checkouts to the pool size so callers wait instead of getting PoolError
+POOL_SLOTS = None
+# Connections idle longer than this are pinged before being handed out
+DB_PING_AFTER_SECONDS = 30
+
+# Hot queries prepared once per connection so Postgres reuses the plan.
+# Only pays off because the pool keeps its connections open (see DB_POOL_MIN)
+PREPARED_STATEMENTS = {
+    "select_user": (
+        "text",
+        "SELECT id, email, password FROM users WHERE email = $1"
+    ),
+    "select_history": (
+        "integer, integer",
+        """SELECT id, platform, input_text, output_text, created_at
+           FROM generations
+           WHERE user_id = $1
+           ORDER BY created_at DESC
+           LIMIT $2"""
+    ),
+}
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Connection that tracks when it was last used and what it has prepared."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_used = time.monotonic()
+        self.prepared = set()
+
+
+def init_pool():
+    global POOL, POOL_SLOTS
+    POOL = ThreadedConnectionPool(
+        minconn=DB_POOL_MIN,
+        maxconn=DB_POOL_MAX,
+        dsn=DATABASE_URL,
+        connection_factory=PooledConnection,
+    )
+    POOL_SLOTS = threading.BoundedSemaphore(DB_POOL_MAX)
+    if DB_POOL_MIN < DB_POOL_MAX:
+        logger.warning(
+            "DB_POOL_MIN (%d) < DB_POOL_MAX (%d): connections above the minimum "
+            "are closed when returned and re-prepare their statements each time",
+            DB_POOL_MIN, DB_POOL_MAX
+        )
+
+
+def execute_prepared(cur, name: str, params: tuple):
+    """Run a statement from PREPARED_STATEMENTS, preparing it on first use."""
+    conn = cur.connection
+    if name not in conn.prepared:
+        types, sql = PREPARED_STATEMENTS[name]
+        cur.execute(f"PREPARE {name} ({types}) AS {sql}")
+        conn.prepared.add(name)
+    placeholders = ", ".join(["%s"] * len(params))
+    cur.execute(f"EXECUTE {name} ({placeholders})", params)
+
+
+def checkout_connection():
+    """Take a connection from the pool, replacing any the server has dropped."""
+    while True:
+        conn = POOL.getconn()
+        if time.monotonic() - conn.last_used < DB_PING_AFTER_SECONDS:
+            return conn
+        try:
+            # The transaction this opens is simply reused by the caller
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            # Discard it and try the next one; once the idle connections run
+            # out the pool opens a fresh one
+            POOL.putconn(conn, close=True)
+
+
+@contextmanager
 def get_db():
-    return psycopg2.connect(os.getenv("DATABASE_URL"))
+    """Borrow a connection from the pool and return it when done."""
+    POOL_SLOTS.acquire()
+    try:
+        conn = checkout_connection()
+        try:
+            yield conn
+        finally:
+            conn.last_used = time.monotonic()
+            POOL.putconn(conn)
+    finally:
+        POOL_SLOTS.release()
 
 
 def init_db():
     """Create tables if they don't exist."""
-    conn = get_db()
-    try:
+    with get_db() as conn:
         with conn.cursor() as cur:
             # Users table
             cur.execute("""
@@ -58,14 +166,29 @@ def init_db():
                     created_at TIMESTAMP   DEFAULT CURRENT_TIMESTAMP
                 )
             """)
+            # Lets /history read a user's newest rows straight off the index
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_generations_user_created
+                ON generations (user_id, created_at DESC)
+            """)
+            # Article embeddings for the semantic cache (needs pgvector)
+            if SEMANTIC_CACHE:
+                cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
+                cur.execute(
+                    f"ALTER TABLE generations ADD COLUMN IF NOT EXISTS embedding vector({EMBEDDING_DIM})"
+                )
         conn.commit()
-    finally:
-        conn.close()
 
 
 # ── Password Utilities ────────────────────────────────────────
+_UPPER = frozenset(string.ascii_uppercase)
+_LOWER = frozenset(string.ascii_lowercase)
+_SPECIAL = frozenset("!@#$%^&*(),.?\":{}|<>")
+_RE_EMAIL = re.compile(r"^[\w\.-]+@[\w\.-]+\.\w+$")
+
+
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
 
 
 def verify_password(password: str, hashed: str) -> bool:
@@ -74,12 +197,15 @@ def verify_password(password: str, hashed: str) -> bool:
 
 def check_password_strength(password: str) -> dict:
     """Check password strength and return details."""
+    # One pass over the password; each class check then only looks at
+    # the distinct characters
+    chars = set(password)
     checks = {
         "length": len(password) >= 8,
-        "uppercase": bool(re.search(r"[A-Z]", password)),
-        "lowercase": bool(re.search(r"[a-z]", password)),
-        "digit": bool(re.search(r"\d", password)),
-        "special": bool(re.search(r"[!@#$%^&*(),.?\":{}|<>]", password)),
+        "uppercase": not chars.isdisjoint(_UPPER),
+        "lowercase": not chars.isdisjoint(_LOWER),
+        "digit": any(c.isdecimal() for c in chars),
+        "special": not chars.isdisjoint(_SPECIAL),
     }
     score = sum(checks.values())
     strength = "weak" if score <= 2 else "medium" if score <= 4 else "strong"
@@ -93,51 +219,155 @@ def create_token(user_id: int, email: str) -> str:
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+# Recently verified tokens, keyed by a hash of the token. get_current_user
+# is async, so FastAPI never runs it in the threadpool and the cache needs no lock
+TOKEN_CACHE = TTLCache(maxsize=10_000, ttl=60)
+
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    cached = TOKEN_CACHE.get(key)
+    if cached is not None and cached[1] > time.time():
+        return cached[0]
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = int(payload.get("sub"))
         email = payload.get("email")
-        return {"id": user_id, "email": email}
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+    user = {"id": user_id, "email": email}
+    TOKEN_CACHE[key] = (user, payload["exp"])
+    return user
+
+
+# ── Generation Writes ─────────────────────────────────────────
+# Generations are queued and written in batches by a background task
+GENERATION_QUEUE = deque()
+GENERATION_LOCK = threading.Lock()
+GENERATION_FLUSH_SECONDS = 0.5
+GENERATION_BATCH_SIZE = 100
+# Oldest queued rows are dropped beyond this, e.g. while the database is down
+GENERATION_QUEUE_MAX = 10_000
+# Errors that mean the connection is gone rather than that a row is bad
+DISCONNECT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+generation_flusher = None
+generation_stop = None
+
+
+def queue_generations(rows: list, front: bool = False):
+    with GENERATION_LOCK:
+        if front:
+            GENERATION_QUEUE.extendleft(reversed(rows))
+        else:
+            GENERATION_QUEUE.extend(rows)
+        dropped = 0
+        while len(GENERATION_QUEUE) > GENERATION_QUEUE_MAX:
+            GENERATION_QUEUE.popleft()
+            dropped += 1
+    if dropped:
+        logger.warning("Generation queue full, dropped %d oldest rows", dropped)
+
+
+def save_generation(user_id: int, platform: str, input_text: str, output_text: str,
+                    embedding: Optional[str] = None):
+    queue_generations([(user_id, platform, input_text, output_text, embedding)])
+
+
+def insert_generations(conn, rows: list):
+    with conn.cursor() as cur:
+        if SEMANTIC_CACHE:
+            execute_values(
+                cur,
+                "INSERT INTO generations (user_id, platform, input_text, output_text, embedding) VALUES %s",
+                rows,
+                template="(%s, %s, %s, %s, %s::vector)",
+                page_size=GENERATION_BATCH_SIZE
+            )
+        else:
+            execute_values(
+                cur,
+                "INSERT INTO generations (user_id, platform, input_text, output_text) VALUES %s",
+                [row[:4] for row in rows],
+                page_size=GENERATION_BATCH_SIZE
+            )
+    conn.commit()
+
+
+def flush_generations():
+    """Write all queued generations, in a single transaction when possible."""
+    with GENERATION_LOCK:
+        rows = list(GENERATION_QUEUE)
+        GENERATION_QUEUE.clear()
+    if not rows:
+        return
 
-def save_generation(user_id: int, platform: str, input_text: str, output_text: str):
-    conn = get_db()
     try:
-        with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO generations (user_id, platform, input_text, output_text) VALUES (%s, %s, %s, %s)",
-                (user_id, platform, input_text, output_text)
-            )
-        conn.commit()
-    finally:
-        conn.close()
+        with get_db() as conn:
+            try:
+                insert_generations(conn, rows)
+                return
+            except DISCONNECT_ERRORS:
+                raise
+            except Exception:
+                conn.rollback()
+                logger.warning("Batch insert failed, saving %d generations one by one", len(rows))
+
+            # One bad row (e.g. a NUL character) fails the whole batch, so
+            # save the rest individually and drop only the rows that fail
+            for i, row in enumerate(rows):
+                try:
+                    insert_generations(conn, [row])
+                except DISCONNECT_ERRORS:
+                    rows = rows[i:]
+                    raise
+                except Exception:
+                    conn.rollback()
+                    logger.exception("Dropping generation that cannot be saved")
+    except DISCONNECT_ERRORS:
+        # Retry on the next flush
+        queue_generations(rows, front=True)
+        raise
+
+
+async def flush_generations_forever(stop: asyncio.Event):
+    """Flush every GENERATION_FLUSH_SECONDS, and once more after stop is set."""
+    while True:
+        try:
+            await asyncio.wait_for(stop.wait(), GENERATION_FLUSH_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        try:
+            await asyncio.to_thread(flush_generations)
+        except Exception:
+            logger.exception("Failed to save generations")
+        if stop.is_set():
+            return
 
 
 @app.on_event("startup")
-def startup():
+async def startup():
+    global generation_flusher, generation_stop
+    init_pool()
     init_db()
-  
-
-#allows the HTML file to talk to FastAPI
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Get Groq API key
-api_key = os.getenv("GROQ_API_KEY")
+    if SEMANTIC_CACHE:
+        load_embedder()
+    generation_stop = asyncio.Event()
+    generation_flusher = asyncio.create_task(flush_generations_forever(generation_stop))
 
-if not api_key:
-    raise ValueError("GROQ_API_KEY not found in .env file")
 
-# Create Groq client
-client = Groq(api_key=api_key)
+@app.on_event("shutdown")
+async def shutdown():
+    try:
+        if generation_flusher is not None:
+            # Let the flush in progress finish and write what is left
+            generation_stop.set()
+            await generation_flusher
+    finally:
+        if POOL is not None:
+            POOL.closeall()
 
 
 # ── Auth Models ──────────────────────────────────────────────
@@ -147,7 +377,7 @@ class UserRegister(BaseModel):
 
     @validator("email")
     def validate_email(cls, v):
-        if not re.match(r"^[\w\.-]+@[\w\.-]+\.\w+$", v):
+        if not _RE_EMAIL.match(v):
             raise ValueError("Invalid email format")
         return v.lower()
 
@@ -174,50 +404,44 @@ def register(user: UserRegister):
     if strength["strength"] == "weak":
         raise HTTPException(status_code=400, detail="Password is too weak")
 
-    conn = get_db()
-    try:
-        with conn.cursor() as cur:
-            # Check if user exists
-            cur.execute("SELECT id FROM users WHERE email = %s", (user.email,))
-            if cur.fetchone():
-                raise HTTPException(status_code=400, detail="Email already registered")
+    # Hash before taking a connection so bcrypt doesn't hold one from the pool
+    hashed = hash_password(user.password)
 
-            # Create user
-            hashed = hash_password(user.password)
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            # Create user; a row only comes back if the email was free
             cur.execute(
-                "INSERT INTO users (email, password) VALUES (%s, %s) RETURNING id",
+                """INSERT INTO users (email, password) VALUES (%s, %s)
+                   ON CONFLICT (email) DO NOTHING
+                   RETURNING id""",
                 (user.email, hashed)
             )
-            user_id = cur.fetchone()[0]
+            row = cur.fetchone()
+            if row is None:
+                raise HTTPException(status_code=400, detail="Email already registered")
+            user_id = row[0]
         conn.commit()
         token = create_token(user_id, user.email)
         return {"token": token, "email": user.email}
-    finally:
-        conn.close()
 
 
 @app.post("/login")
 def login(user: UserLogin):
-    conn = get_db()
-    try:
+    with get_db() as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                "SELECT id, email, password FROM users WHERE email = %s",
-                (user.email.lower(),)
-            )
+            execute_prepared(cur, "select_user", (user.email.lower(),))
             row = cur.fetchone()
 
-            if not row or not verify_password(user.password, row[2]):
-                raise HTTPException(status_code=401, detail="Invalid email or password")
+    # Verify after returning the connection so bcrypt doesn't hold one from the pool
+    if not row or not verify_password(user.password, row[2]):
+        raise HTTPException(status_code=401, detail="Invalid email or password")
 
-            token = create_token(row[0], row[1])
+    token = create_token(row[0], row[1])
 
-            return {
-                "token": token,
-                "email": row[1]
-            }
-    finally:
-        conn.close()
+    return {
+        "token": token,
+        "email": row[1]
+    }
 
 
 @app.post("/check-password")
@@ -225,58 +449,6 @@ def check_password(data: PasswordCheck):
     return check_password_strength(data.password)
 
 
-# ── Platform Prompts ─────────────────────────────────────────
-PLATFORM_PROMPTS = {
-    "twitter": """
-You are a viral Twitter/X content expert.
-Convert the article into a punchy 5-tweet thread.
-- Start with a hook tweet that grabs attention immediately
-- Each tweet must be under 280 characters
-- Label each tweet: Tweet 1:, Tweet 2:, etc.
-- End with a call-to-action tweet
-- Add relevant hashtags
-""",
-    "linkedin": """
-You are a professional LinkedIn content strategist.
-Convert the article into a LinkedIn post.
-- Start with a bold first line that stops the scroll
-- Use short paragraphs (2-3 lines max)
-- Add 3-5 key takeaways using bullet points
-- End with a thought-provoking question
-- Keep it between 150-300 words
-""",
-    "instagram": """
-You are an Instagram caption expert.
-Convert the article into an engaging Instagram caption.
-- Hook in the first line
-- Storytelling style, personal and relatable
-- Add a clear call-to-action at the end
-- Suggest 10 relevant hashtags at the bottom
-- Keep caption under 200 words
-""",
-    "newsletter": """
-You are an email newsletter writer.
-Convert the article into a short newsletter section.
-- Write a catchy subject line first (label it: Subject:)
-- Conversational, friendly tone
-- Summarize the core idea in 3 short paragraphs
-- Add one actionable tip the reader can use today
-- End with a 1-sentence teaser for next week
-""",
-    "medium": """
-You are a Medium blog writer.
-Convert the article into a well-structured Medium post.
-- Write a compelling title (label it: Title:)
-- Start with a strong opening paragraph that draws the reader in
-- Use clear subheadings to break up sections
-- Write in a thoughtful, conversational tone
-- Include real examples or analogies to explain key points
-- End with a powerful conclusion and a question for readers
-- Aim for 400-600 words
-"""
-}
-
-
 # ── Request Model ─────────────────────────────────────────────
 class ArticleRequest(BaseModel):
     article: str
@@ -289,50 +461,158 @@ async def home():
         return f.read()
 
 
-def repurpose_content(article: str, platform: str):
+# Approximates the Llama tokenizer closely enough for a size limit
+ENCODING = tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str) -> int:
+    return len(ENCODING.encode(text, disallowed_special=()))
+
+
+# ── Response Cache ────────────────────────────────────────────
+# Only touched from the event loop thread, so no lock is needed
+RESPONSE_CACHE = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+
+
+def cache_key(article: str, platform: str) -> bytes:
+    return hashlib.sha256(f"{platform}\0{article}".encode()).digest()
+
+
+# ── Semantic Cache ────────────────────────────────────────────
+embedder = None
+
+
+def load_embedder():
+    global embedder
+    from sentence_transformers import SentenceTransformer
+    embedder = SentenceTransformer(EMBEDDING_MODEL)
+
+
+def embed_article(article: str) -> str:
+    """Embed an article and return it as a pgvector literal."""
+    vector = embedder.encode(article, normalize_embeddings=True)
+    return "[" + ",".join(map(str, vector.tolist())) + "]"
+
+
+def find_similar_generation(user_id: int, platform: str, embedding: str) -> Optional[str]:
+    """Return one of the user's stored outputs whose article is close enough to this one."""
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            # Only the user's own generations, so nobody gets output built
+            # from someone else's article
+            cur.execute(
+                """SELECT output_text, embedding <=> %s::vector AS distance
+                   FROM generations
+                   WHERE user_id = %s AND platform = %s AND embedding IS NOT NULL
+                   ORDER BY embedding <=> %s::vector
+                   LIMIT 1""",
+                (embedding, user_id, platform, embedding)
+            )
+            row = cur.fetchone()
+    if row and 1 - row[1] >= SEMANTIC_CACHE_THRESHOLD:
+        return row[0]
+    return None
+
+
+async def stream_text(text: str):
+    yield text
+
+
+async def stream_completion(stream):
+    """Yield tokens as they arrive."""
+    # Closes the HTTP response even if the client disconnects mid-stream
+    async with stream:
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+async def repurpose_content(article: str, platform: str, user_id: int):
+    """Return an async iterator over the repurposed text, the article's
+    embedding (None unless the semantic cache computed one) and the cache
+    key to store the text under (None when it came from a cache)."""
+
+    # Identical requests skip the model entirely
+    key = cache_key(article, platform)
+    cached = RESPONSE_CACHE.get(key)
+    if cached is not None:
+        return stream_text(cached), None, None
+
+    # Near-duplicates of the user's own articles reuse an earlier generation.
+    # Not stored in RESPONSE_CACHE, which is shared between users
+    embedding = None
+    if SEMANTIC_CACHE:
+        embedding = await asyncio.to_thread(embed_article, article)
+        similar = await asyncio.to_thread(find_similar_generation, user_id, platform, embedding)
+        if similar is not None:
+            return stream_text(similar), embedding, None
 
     # Pick the right prompt based on platform
     instructions = PLATFORM_PROMPTS[platform]
 
-    prompt = instructions + "\n\nARTICLE:\n" + article
-
     try:
-        response = client.chat.completions.create(
+        # Static instructions go first in their own message so the provider
+        # can reuse the cached prefix; only the article changes per request
+        stream = await client.chat.completions.create(
             model="llama-3.3-70b-versatile",
             messages=[
-                {"role": "user", "content": prompt}
-            ]
+                {"role": "system", "content": instructions},
+                {"role": "user", "content": "ARTICLE:\n" + article}
+            ],
+            stream=True
         )
-        return response.choices[0].message.content
+        return stream_completion(stream), embedding, key
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Ends a /repurpose body that failed after streaming started; the error
+# detail follows it
+STREAM_ERROR_MARKER = "\x1e"
+
+
+async def stream_and_save(chunks, key: Optional[bytes], user_id: int, platform: str,
+                          article: str, embedding: Optional[str]):
+    parts = []
+    try:
+        async for text in chunks:
+            parts.append(text)
+            yield text
+    except Exception as e:
+        # Headers are already sent, so report it in the body and keep the
+        # partial text out of the cache and history
+        logger.exception("Generation failed mid-stream")
+        yield STREAM_ERROR_MARKER + str(e)
+        return
+    result = "".join(parts)
+    if key is not None:
+        RESPONSE_CACHE[key] = result
+    save_generation(user_id, platform, article, result, embedding)
+
+
 @app.post("/repurpose")
-def repurpose_endpoint(request: ArticleRequest, user: dict = Depends(get_current_user)):
-    result = repurpose_content(request.article, request.platform)
-    save_generation(user["id"], request.platform, request.article, result)
-    return {
-        "platform": request.platform,
-        "repurposed_content": result
-    }
+async def repurpose_endpoint(request: ArticleRequest, user: dict = Depends(get_current_user)):
+    # Reject oversize articles before paying for a model call
+    tokens = await asyncio.to_thread(count_tokens, request.article)
+    if tokens > MAX_ARTICLE_TOKENS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Article is too long ({tokens} tokens, max {MAX_ARTICLE_TOKENS})"
+        )
+
+    chunks, embedding, key = await repurpose_content(request.article, request.platform, user["id"])
+    return StreamingResponse(
+        stream_and_save(chunks, key, user["id"], request.platform, request.article, embedding),
+        media_type="text/plain; charset=utf-8"
+    )
 
 
 @app.get("/history")
-def get_history(limit: int = 20, user: dict = Depends(get_current_user)):
-    conn = get_db()
-    try:
+def get_history(limit: int = Query(20, ge=1, le=100), user: dict = Depends(get_current_user)):
+    with get_db() as conn:
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute(
-                """SELECT id, platform, input_text, output_text, created_at
-                   FROM generations
-                   WHERE user_id = %s
-                   ORDER BY created_at DESC
-                   LIMIT %s""",
-                (user["id"], limit,)
-            )
+            execute_prepared(cur, "select_history", (user["id"], limit))
             rows = cur.fetchall()
-        return {"history": [dict(r) for r in rows]}
-    finally:
-        conn.close()
\ No newline at end of file
+        return {"history": rows}
\ No newline at end of file